@@ -0,0 +1,69 @@
+"""
+Export the pickled model and scaler to a single NumPy .npz file.
+
+frontend.py loads `drain_status_model.npz` while its recorded digest still
+matches the pickles, so the app can start without importing joblib or
+scikit-learn. Only a single decision tree can be exported. Re-run after
+retraining:
+
+    python export_artifacts.py
+"""
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+
+def pickle_digest(paths):
+    # SHA-256 over the raw pickle bytes, recorded in the .npz so the app can
+    # tell whether the export still matches the pickles next to it
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def artifact_arrays(model, scaler):
+    # Flat decision tree arrays with every node resolved to its
+    # (class, confidence), plus the scaler statistics in float32
+    if not hasattr(model, "tree_"):
+        raise TypeError(
+            f"Only a single decision tree can be exported, got {type(model).__name__}. "
+            "The app loads the pickles directly while drain_status_model.npz doesn't match them."
+        )
+    tree = model.tree_
+    probs = tree.value[:, 0] / tree.value[:, 0].sum(axis=1, keepdims=True)
+    best = probs.argmax(axis=1)
+    return {
+        'children_left': tree.children_left,
+        'children_right': tree.children_right,
+        'feature': tree.feature,
+        'threshold': tree.threshold,
+        'leaf_class': model.classes_[best],
+        'leaf_confidence': probs[np.arange(tree.node_count), best],
+        'mean': scaler.mean_.astype(np.float32),
+        'scale': scaler.scale_.astype(np.float32),
+    }
+
+
+if __name__ == "__main__":
+    # Imported here so frontend.py can use pickle_digest without joblib
+    import joblib
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    model_path = os.path.join(current_dir, 'drain_status_model.pkl')
+    scaler_path = os.path.join(current_dir, 'scaler.pkl')
+    model = joblib.load(model_path)
+    scaler = joblib.load(scaler_path)
+
+    try:
+        arrays = artifact_arrays(model, scaler)
+    except TypeError as e:
+        sys.exit(f"Error: {e}")
+
+    npz_path = os.path.join(current_dir, 'drain_status_model.npz')
+    arrays['source_digest'] = np.array(pickle_digest((model_path, scaler_path)))
+    np.savez_compressed(npz_path, **arrays)
+    print(f"Saved {npz_path}")
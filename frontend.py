@@ -1,8 +1,12 @@
 import streamlit as st
-import pandas as pd
-import joblib
 import numpy as np
 import os
+import itertools
+
+from export_artifacts import pickle_digest
+
+# Feature order used during training (see drain_prediction-1.ipynb)
+FEATURES = ['gas_value', 'rain_value', 'temp_value', 'water_dist', 'wf_value']
 
 # -----------------------------------------------------------------------------
 # 1. Page Configuration
@@ -17,7 +21,11 @@ st.set_page_config(
 # -----------------------------------------------------------------------------
 # 2. Custom Styling (Dark Mode & Glassmorphism)
 # -----------------------------------------------------------------------------
-st.markdown("""
+# Built once per process; Streamlit still needs the element emitted on every
+# rerun, otherwise the style block is dropped from the page.
+@st.cache_resource
+def _inject_css():
+    return """
 <style>
     /* Background Gradient */
     .stApp {
@@ -73,32 +81,205 @@ st.markdown("""
         background-color: #38bdf8 !important;
     }
 
+    /* Raw data table */
+    table.mini-tbl {
+        width: 100%;
+        font-size: 0.85rem;
+    }
+
 </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(_inject_css(), unsafe_allow_html=True)
+
+# Status metadata indexed by prediction (0 = Blocked, 1 = Normal):
+# (label, color, background, icon, message, sub message)
+STATUS_TABLE = (
+    ("BLOCKED", "#ef4444", "rgba(239, 68, 68, 0.1)", "🚨",  # Red
+     "CRITICAL OBSTRUCTION DETECTED", "Immediate maintenance team dispatch required."),
+    ("NORMAL", "#22c55e", "rgba(34, 197, 94, 0.1)", "✅",  # Green
+     "SYSTEM OPTIMAL", "Water flow is unobstructed."),
+)
+
+# Every possible hero card and badge row, pre-rendered once per process
+@st.cache_resource
+def _build_html_tables():
+    hero_html = {}
+    for prediction in (0, 1):
+        status_label, status_color, bg_color, result_icon, message, sub_message = STATUS_TABLE[prediction]
+        hero_html[prediction] = f"""
+        <div style="
+            background: linear-gradient(90deg, {bg_color}, transparent);
+            border-left: 5px solid {status_color};
+            padding: 20px;
+            border-radius: 8px;
+            margin-bottom: 25px;
+        ">
+            <h2 style="margin:0; color: {status_color};">{result_icon} {status_label}</h2>
+            <p style="font-size: 1.2rem; margin: 5px 0 0 0; opacity: 0.9;">{message}</p>
+            <small style="opacity: 0.7;">{sub_message}</small>
+        </div>
+        """
+
+    # Keyed by (rain, gas, flow) as 0/1 flags
+    badge_html = {}
+    for rain_val, gas_val, wf_val in itertools.product((0, 1), repeat=3):
+        badge_html[(rain_val, gas_val, wf_val)] = f"""
+        <div style="display: flex; gap: 10px; flex-wrap: wrap;">
+            <span style="background: {'rgba(56, 189, 248, 0.2)' if rain_val else 'rgba(255,255,255,0.05)'}; padding: 5px 10px; border-radius: 20px; border: 1px solid {'#38bdf8' if rain_val else 'rgba(255,255,255,0.1)'}">
+                {'🌧️ Raining' if rain_val else '☁️ No Rain'}
+            </span>
+            <span style="background: {'rgba(239, 68, 68, 0.2)' if gas_val else 'rgba(255,255,255,0.05)'}; padding: 5px 10px; border-radius: 20px; border: 1px solid {'#ef4444' if gas_val else 'rgba(255,255,255,0.1)'}">
+                {'⚠️ Gas Detected' if gas_val else '💨 No Gas'}
+            </span>
+            <span style="background: {'rgba(34, 197, 94, 0.2)' if wf_val else 'rgba(239, 68, 68, 0.2)'}; padding: 5px 10px; border-radius: 20px; border: 1px solid {'#22c55e' if wf_val else '#ef4444'}">
+                {'🌊 Flowing' if wf_val else '🛑 No Flow'}
+            </span>
+        </div>
+        """
+    # Raw data table minus the single row of values, which is spliced in per input
+    header = "".join(f"<th>{name}</th>" for name in FEATURES)
+    table_head = f'<table class="mini-tbl"><thead><tr>{header}</tr></thead><tbody><tr>'
+    table_tail = '</tr></tbody></table>'
+    return hero_html, badge_html, table_head, table_tail
+
+HERO_HTML, BADGE_HTML, TABLE_HEAD_HTML, TABLE_TAIL_HTML = _build_html_tables()
 
 # -----------------------------------------------------------------------------
 # 3. Load Models
 # -----------------------------------------------------------------------------
+def _compile_tree(arrays):
+    # Flatten the decision tree into plain lists. Every leaf is already
+    # resolved to its (class, confidence), so predicting a single row is a
+    # handful of list lookups instead of sklearn's per-call validation.
+    children_left = arrays['children_left'].tolist()
+    children_right = arrays['children_right'].tolist()
+    feature = arrays['feature'].tolist()
+    threshold = arrays['threshold'].tolist()
+    leaf_result = list(zip(arrays['leaf_class'].tolist(), arrays['leaf_confidence'].tolist()))
+    
+    def predict_row(row):
+        # Same split rule as sklearn: float32 feature <= float64 threshold
+        x = row.tolist()
+        node = 0
+        while children_left[node] != -1:
+            if x[feature[node]] <= threshold[node]:
+                node = children_left[node]
+            else:
+                node = children_right[node]
+        return leaf_result[node]
+    
+    return predict_row
+
+def _sklearn_predictor(model):
+    # Generic fallback for estimators that aren't a single decision tree;
+    # predict_proba support is checked once here, not on every inference
+    has_proba = hasattr(model, "predict_proba")
+    
+    def predict_row(row):
+        X = row.reshape(1, -1)
+        if has_proba:
+            # One forward pass: the predicted class is the most probable one
+            probs = model.predict_proba(X)[0]
+            best = int(np.argmax(probs))
+            return int(model.classes_[best]), float(probs[best])
+        prediction = int(model.predict(X)[0])
+        # Mock confidence if model doesn't support predict_proba
+        return prediction, 0.98 if prediction == 1 else 0.85
+    
+    return predict_row
+
+def _load_pickles(model_path, scaler_path):
+    # Fallback when drain_status_model.npz is missing or stale. Imported here
+    # so the .npz path never pulls in joblib, scikit-learn or the executor.
+    from concurrent.futures import ThreadPoolExecutor
+    import joblib
+    from export_artifacts import artifact_arrays
+    
+    # Load the artifacts concurrently (arrays are memory-mapped read-only
+    # and shared across workers)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        model_future = executor.submit(joblib.load, model_path, mmap_mode='r')
+        scaler_future = executor.submit(joblib.load, scaler_path, mmap_mode='r')
+        model, scaler = model_future.result(), scaler_future.result()
+    
+    if hasattr(model, "tree_"):
+        arrays = artifact_arrays(model, scaler)
+        return _compile_tree(arrays), arrays['mean'], arrays['scale']
+    
+    # Keep the scaler statistics in float32 like the tree path
+    return _sklearn_predictor(model), scaler.mean_.astype(np.float32), scaler.scale_.astype(np.float32)
+
 @st.cache_resource
 def load_artifacts():
     try:
         current_dir = os.path.dirname(os.path.abspath(__file__))
+        npz_path = os.path.join(current_dir, 'drain_status_model.npz')
         model_path = os.path.join(current_dir, 'drain_status_model.pkl')
         scaler_path = os.path.join(current_dir, 'scaler.pkl')
         
-        if not os.path.exists(model_path) or not os.path.exists(scaler_path):
-            st.error(f"⚠️ Artifacts missing! Expected in: {current_dir}")
-            return None, None
-            
-        # Load the artifacts
-        model = joblib.load(model_path)
-        scaler = joblib.load(scaler_path)
-        return model, scaler
+        # Digest the .npz has to match; None when the app is deployed with
+        # the export alone
+        try:
+            source_digest = pickle_digest((model_path, scaler_path))
+        except FileNotFoundError:
+            source_digest = None
+        
+        # Exported by export_artifacts.py: tree arrays plus float32 scaler
+        # stats, stamped with the digest of the pickles they came from. A
+        # retrained model that wasn't re-exported no longer matches.
+        predict_row = None
+        try:
+            with np.load(npz_path) as arrays:
+                if source_digest is None or str(arrays.get('source_digest')) == source_digest:
+                    predict_row = _compile_tree(arrays)
+                    mean, scale = arrays['mean'], arrays['scale']
+                    artifact_path, model_digest = npz_path, str(arrays.get('source_digest'))
+        except FileNotFoundError:
+            pass
+        
+        if predict_row is None:
+            predict_row, mean, scale = _load_pickles(model_path, scaler_path)
+            artifact_path, model_digest = model_path, source_digest
+        
+        # Fold the scaler's (x - mean_) / scale_ into a single multiply-add
+        # so inference doesn't need a separate transform pass
+        inv_scale = np.float32(1.0) / scale
+        neg_mean_over_scale = -mean * inv_scale
+        
+        # Throwaway prediction so lazy setup is paid here, not by the first
+        # user; a failure here means every real prediction will fail too
+        try:
+            predict_row(np.zeros(len(inv_scale), dtype=np.float32))
+        except Exception as e:
+            st.warning(f"⚠️ Model warmup prediction failed: {e}")
+        
+        # Part of run_inference's cache key, so results from a previously
+        # loaded model are never served for a replaced artifact. Reuses the
+        # pickle digest instead of stat-ing the artifacts again.
+        artifact_name = os.path.basename(artifact_path)
+        model_version = f"{artifact_name}@{model_digest}"
+        return predict_row, inv_scale, neg_mean_over_scale, artifact_name, model_version
+    except FileNotFoundError as e:
+        st.error(f"⚠️ Artifacts missing: {e.filename}")
+        return None, None, None, None, None
     except Exception as e:
         st.error(f"❌ Error loading model artifacts: {e}")
-        return None, None
+        return None, None, None, None, None
 
-model, scaler = load_artifacts()
+predict_row, inv_scale, neg_mean_over_scale, artifact_name, model_version = load_artifacts()
+
+@st.cache_data(max_entries=256)
+def run_inference(_predict_row, _inv_scale, _neg_mean_over_scale, model_version, gas, rain, temp, dist, wf):
+    # Predictor and scaler terms come from st.cache_resource, so the leading
+    # underscore keeps Streamlit from hashing them; model_version stands in
+    # for them in the key alongside the inputs.
+    input_row = np.array([gas, rain, temp, dist, wf], dtype=np.float32)
+    
+    # Equivalent to scaler.transform, computed in place on the fresh row
+    scaled_row = np.multiply(input_row, _inv_scale, out=input_row)
+    np.add(scaled_row, _neg_mean_over_scale, out=scaled_row)
+    return _predict_row(scaled_row)
 
 # -----------------------------------------------------------------------------
 # 4. Sidebar (Inputs)
@@ -109,19 +290,24 @@ with st.sidebar:
     
     st.subheader("Sensor Inputs")
     
-    # Environmental
-    st.caption("Environment")
-    rain_val = st.toggle("🌧️ Raining", value=False)
-    temp_val = st.slider("🌡️ Temperature (°C)", -10.0, 50.0, 25.0, 0.1)
-    
-    st.caption("Drainage")
-    # Note: 792 was a value in the dataset associated with 'Normal'.
-    water_dist = st.slider("📏 Water Distance (mm)", 0, 1000, 792, help="Distance from sensor to water surface.")
-    gas_val = st.toggle("⚠️ Toxic Gas", value=False)
-    wf_val = st.toggle("🌊 Water Flowing", value=True)
+    # Widgets live in a form so dialing in a scenario doesn't rerun the app
+    # on every change; only the submit button triggers a prediction.
+    with st.form("controls"):
+        # Environmental
+        st.caption("Environment")
+        rain_val = st.toggle("🌧️ Raining", value=False)
+        temp_val = st.slider("🌡️ Temperature (°C)", -10.0, 50.0, 25.0, 0.1)
+        
+        st.caption("Drainage")
+        # Note: 792 was a value in the dataset associated with 'Normal'.
+        water_dist = st.slider("📏 Water Distance (mm)", 0, 1000, 792, help="Distance from sensor to water surface.")
+        gas_val = st.toggle("⚠️ Toxic Gas", value=False)
+        wf_val = st.toggle("🌊 Water Flowing", value=True)
+        
+        submitted = st.form_submit_button("Run prediction", use_container_width=True)
     
     st.markdown("---")
-    st.info("Adjust simulators to test prediction logic.")
+    st.info("Adjust simulators and press Run prediction to test prediction logic.")
 
 # -----------------------------------------------------------------------------
 # 5. Main Dashboard
@@ -129,98 +315,65 @@ with st.sidebar:
 st.title("Drain Guard AI")
 st.markdown("#### 🚀 Next-Gen Urban Drainage Monitoring System")
 
-if model and scaler:
+if predict_row is not None:
     # --- Data Preparation ---
-    # Construct DataFrame with EXACT feature names and order from training
-    input_data = pd.DataFrame([{
-        'gas_value': int(gas_val),
-        'rain_value': int(rain_val),
-        'temp_value': float(temp_val),
-        'water_dist': float(water_dist),
-        'wf_value': int(wf_val)
-    }])
+    # Inputs in the EXACT feature order from training; run_inference casts
+    # them (booleans included) to float32 in a single NumPy constructor
+    input_values = (gas_val, rain_val, temp_val, water_dist, wf_val)
     
     # --- Prediction ---
     try:
-        # Scale inputs
-        scaled_input = scaler.transform(input_data)
-        
-        # Predict
-        prediction = model.predict(scaled_input)[0]
+        # Form widgets only change on submit, so the stored result always
+        # matches the values shown in the sidebar
+        if submitted:
+            st.session_state.last_pred = run_inference(predict_row, inv_scale, neg_mean_over_scale, model_version, *input_values)
         
-        # Map Prediction (0 = Blocked, 1 = Normal)
-        if prediction == 0:
-            status_label = "BLOCKED"
-            status_color = "#ef4444" # Red
-            bg_color = "rgba(239, 68, 68, 0.1)"
-            result_icon = "🚨"
-            message = "CRITICAL OBSTRUCTION DETECTED"
-            sub_message = "Immediate maintenance team dispatch required."
+        if "last_pred" not in st.session_state:
+            st.info("👈 Set the sensor inputs and press **Run prediction**.")
         else:
-            status_label = "NORMAL"
-            status_color = "#22c55e" # Green
-            bg_color = "rgba(34, 197, 94, 0.1)"
-            result_icon = "✅"
-            message = "SYSTEM OPTIMAL"
-            sub_message = "Water flow is unobstructed."
-
-        # --- Enhanced UI Layout ---
-        
-        # Top Hero Section
-        st.markdown(f"""
-        <div style="
-            background: linear-gradient(90deg, {bg_color}, transparent);
-            border-left: 5px solid {status_color};
-            padding: 20px;
-            border-radius: 8px;
-            margin-bottom: 25px;
-        ">
-            <h2 style="margin:0; color: {status_color};">{result_icon} {status_label}</h2>
-            <p style="font-size: 1.2rem; margin: 5px 0 0 0; opacity: 0.9;">{message}</p>
-            <small style="opacity: 0.7;">{sub_message}</small>
-        </div>
-        """, unsafe_allow_html=True)
+            prediction, confidence = st.session_state.last_pred
+            
+            # Reuse the HTML assembled on the previous rerun if neither the
+            # inputs nor the prediction (which changes with a reloaded model)
+            # have changed since. The key is compared as a tuple rather than
+            # hash() because e.g. hash(-1.0) == hash(-2.0).
+            render_key = (input_values, st.session_state.last_pred)
+            if st.session_state.get("last_render_key") != render_key or "last_html" not in st.session_state:
+                # A 1x5 row doesn't need the interactive data grid component
+                row = "".join(f"<td>{value:g}</td>" for value in input_values)
+                st.session_state.last_html = (
+                    HERO_HTML[prediction],
+                    # Toggles return bools, which match the table's 0/1 keys
+                    BADGE_HTML[(rain_val, gas_val, wf_val)],
+                    TABLE_HEAD_HTML + row + TABLE_TAIL_HTML
+                )
+                st.session_state.last_render_key = render_key
+            hero_html, badge_html, table_html = st.session_state.last_html
+            
+            # --- Enhanced UI Layout ---
+            
+            # Top Hero Section
+            st.markdown(hero_html, unsafe_allow_html=True)
 
-        col1, col2 = st.columns([1, 1], gap="large")
-        
-        with col1:
-            st.subheader("📡 Live Telemetry")
+            col1, col2 = st.columns([1, 1], gap="large")
             
-            c1, c2 = st.columns(2)
-            c1.metric("🌡️ Temp", f"{temp_val} °C", delta=f"{temp_val-25:.1f}°C")
-            c2.metric("📏 Level", f"{water_dist} mm", delta="-12mm" if water_dist < 500 else "Normal")
+            with col1:
+                st.subheader("📡 Live Telemetry")
             
-            st.markdown("### Status Indicators")
-            # Custom badges
-            st.markdown(f"""
-            <div style="display: flex; gap: 10px; flex-wrap: wrap;">
-                <span style="background: {'rgba(56, 189, 248, 0.2)' if rain_val else 'rgba(255,255,255,0.05)'}; padding: 5px 10px; border-radius: 20px; border: 1px solid {'#38bdf8' if rain_val else 'rgba(255,255,255,0.1)'}">
-                    {'🌧️ Raining' if rain_val else '☁️ No Rain'}
-                </span>
-                <span style="background: {'rgba(239, 68, 68, 0.2)' if gas_val else 'rgba(255,255,255,0.05)'}; padding: 5px 10px; border-radius: 20px; border: 1px solid {'#ef4444' if gas_val else 'rgba(255,255,255,0.1)'}">
-                    {'⚠️ Gas Detected' if gas_val else '💨 No Gas'}
-                </span>
-                <span style="background: {'rgba(34, 197, 94, 0.2)' if wf_val else 'rgba(239, 68, 68, 0.2)'}; padding: 5px 10px; border-radius: 20px; border: 1px solid {'#22c55e' if wf_val else '#ef4444'}">
-                    {'🌊 Flowing' if wf_val else '🛑 No Flow'}
-                </span>
-            </div>
-            """, unsafe_allow_html=True)
-
-        with col2:
-            st.subheader("🧠 Model Confidence")
-            confidence = 0.98 if status_label == "NORMAL" else 0.85 # Mock confidence if model doesn't support predict_proba
+                c1, c2 = st.columns(2)
+                c1.metric("🌡️ Temp", f"{temp_val} °C", delta=f"{temp_val-25:.1f}°C")
+                c2.metric("📏 Level", f"{water_dist} mm", delta="-12mm" if water_dist < 500 else "Normal")
             
-            # Try to get probability if available
-            try:
-                probs = model.predict_proba(scaled_input)[0]
-                confidence = max(probs)
-            except:
-                pass
-
-            st.progress(confidence, text=f"confidence: {confidence*100:.1f}%")
+                st.markdown("### Status Indicators")
+                # Custom badges
+                st.markdown(badge_html, unsafe_allow_html=True)
+
+            with col2:
+                st.subheader("🧠 Model Confidence")
+                st.progress(confidence, text=f"confidence: {confidence*100:.1f}%")
             
-            with st.expander("🔍 View Raw Analysis Data"):
-                st.dataframe(input_data, use_container_width=True, hide_index=True)
+                with st.expander("🔍 View Raw Analysis Data"):
+                    st.markdown(table_html, unsafe_allow_html=True)
 
 
     except Exception as e:
@@ -231,4 +384,4 @@ else:
 
 # Footer
 st.markdown("---")
-st.caption("System v2.0 | Connecting to `drain_status_model.pkl` | Edunet Foundation")
+st.caption(f"System v2.0 | Connecting to `{artifact_name or 'no model loaded'}` | Edunet Foundation")